@@ -4,14 +4,16 @@
 @version: 2.32
 @date: 30/10/2024
 
-Warning: Built for use with python 3.6+
+Warning: Built for use with python 3.7+
 '''
 
 import signal
 import os
+import ctypes
+import multiprocessing
 from configparser import ConfigParser
-from time import sleep
-from prometheus_client import start_http_server, Gauge
+from prometheus_client import start_http_server, CollectorRegistry
+from prometheus_client.core import GaugeMetricFamily
 from os_stats import os_stats
 
 # conf file block
@@ -20,6 +22,106 @@ CONF_FILE_PATH = os.path.join('..', 'conf', 'flameglow.conf')
 NVME_DEVICE_NAME = 'nvme'
 SUPPORTED_GPU_TYPES = ('nvidia', 'amd', 'raspberrypi')
 
+# indexes of the individual stats in the shared metrics array
+AVG_CPU_USAGE = 0
+MEMORY_LOAD = 1
+UPTIME = 2
+NET_REC_RATE = 3
+NET_TRANS_RATE = 4
+IO_READ_RATE = 5
+IO_WRITE_RATE = 6
+CPU_PACKAGE_TEMP = 7
+GPU_USAGE = 8
+GPU_MEMORY_USAGE = 9
+GPU_TEMP = 10
+NVME_COMPOSITE_TEMP = 11
+# flag slot - nonzero once the rate slots hold an actual delta
+RATES_VALID = 12
+METRICS_ARRAY_SIZE = 13
+
+# as defined in <linux/time.h>
+CLOCK_MONOTONIC = 1
+
+class timespec(ctypes.Structure):
+    _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+class itimerspec(ctypes.Structure):
+    _fields_ = [('it_interval', timespec), ('it_value', timespec)]
+
+def create_collection_timer(interval):
+    '''set up a periodic timerfd which fires on an absolute schedule,
+       unaffected by how long the stats collection itself takes'''
+    libc = ctypes.CDLL('libc.so.6', use_errno=True)
+
+    timer_fd = libc.timerfd_create(CLOCK_MONOTONIC, 0)
+    if timer_fd == -1:
+        raise OSError(ctypes.get_errno(), 'timerfd_create failed')
+
+    timer_spec = itimerspec(timespec(interval, 0), timespec(interval, 0))
+    if libc.timerfd_settime(timer_fd, 0, ctypes.byref(timer_spec), None) == -1:
+        raise OSError(ctypes.get_errno(), 'timerfd_settime failed')
+
+    return timer_fd
+
+class flameglow_collector(object):
+    '''pull-based collector which reads the shared metrics array only
+       when Prometheus actually scrapes the endpoint'''
+
+    def __init__(self, metrics_array, gpu_type, io_device):
+        self._metrics_array = metrics_array
+        self._gpu_type = gpu_type
+        self._io_device = io_device
+
+    def collect(self):
+        metrics_array = self._metrics_array
+
+        yield GaugeMetricFamily('proc_stats_avg_cpu_usage', 'Average CPU usage over the last minute',
+                                value=metrics_array[AVG_CPU_USAGE])
+        yield GaugeMetricFamily('proc_stats_memory_load', 'Current RAM memory usage',
+                                value=metrics_array[MEMORY_LOAD])
+        yield GaugeMetricFamily('proc_stats_uptime', 'System uptime in seconds',
+                                value=metrics_array[UPTIME])
+        # don't publish the rates until a first delta has been collected -
+        # scrapes will report 'no data' rather than a misleading 0
+        if metrics_array[RATES_VALID]:
+            yield GaugeMetricFamily('proc_stats_rec_rate', 'Bytes received on the specified network interface',
+                                    value=metrics_array[NET_REC_RATE])
+            yield GaugeMetricFamily('proc_stats_trans_rate', 'Byes transmitted on the specified network interface',
+                                    value=metrics_array[NET_TRANS_RATE])
+            yield GaugeMetricFamily('proc_stats_io_read_rate', 'Bytes read on the specified io device',
+                                    value=metrics_array[IO_READ_RATE])
+            yield GaugeMetricFamily('proc_stats_io_write_rate', 'Bytes written on the specified io device',
+                                    value=metrics_array[IO_WRITE_RATE])
+
+        yield GaugeMetricFamily('sys_stats_cpu_package_temp', 'Current CPU package temperature',
+                                value=metrics_array[CPU_PACKAGE_TEMP])
+        # core and memory usage statistics are only supported on Nvidia GPUs for now
+        if self._gpu_type == SUPPORTED_GPU_TYPES[0]:
+            yield GaugeMetricFamily('sys_stats_gpu_usage', 'Average GPU core usage',
+                                    value=metrics_array[GPU_USAGE])
+            yield GaugeMetricFamily('sys_stats_gpu_memory_usage', 'Amount of used GPU memory',
+                                    value=metrics_array[GPU_MEMORY_USAGE])
+        if self._gpu_type in SUPPORTED_GPU_TYPES:
+            yield GaugeMetricFamily('sys_stats_gpu_temp', 'Current GPU temperature',
+                                    value=metrics_array[GPU_TEMP])
+        if NVME_DEVICE_NAME in self._io_device:
+            yield GaugeMetricFamily('sys_stats_nvme_composite_temp', 'Current NVMe composite temperature',
+                                    value=metrics_array[NVME_COMPOSITE_TEMP])
+
+def start_metrics_server(port, metrics_array, gpu_type, io_device):
+    '''serve Prometheus scrapes out-of-process, so that HTTP request
+       handling never contends with the collection loop for the GIL'''
+    # lifetime is managed by the parent process
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    registry = CollectorRegistry()
+    registry.register(flameglow_collector(metrics_array, gpu_type, io_device))
+    start_http_server(port, registry=registry)
+
+    # the http server runs on a daemon thread - keep the process alive
+    signal.pause()
+
 def sigterm_handler(signum, frame):
     print('Stopping stats collection due to SIGTERM...')
 
@@ -64,65 +166,69 @@ if __name__ == '__main__':
 
     ### Prometheus client metrics ###############################################################################
 
-    #----------------------------------------------- os_stats ---------------------------------------------------
-    proc_stats_avg_cpu_usage = Gauge('proc_stats_avg_cpu_usage', 'Average CPU usage over the last minute')
-    proc_stats_memory_load = Gauge('proc_stats_memory_load', 'Current RAM memory usage')
-    proc_stats_uptime = Gauge('proc_stats_uptime', 'System uptime in seconds')
-    proc_stats_rec_rate = Gauge('proc_stats_rec_rate', 'Bytes received on the specified network interface')
-    proc_stats_trans_rate = Gauge('proc_stats_trans_rate', 'Byes transmitted on the specified network interface')
-    proc_stats_io_read_rate = Gauge('proc_stats_io_read_rate', 'Bytes read on the specified io device')
-    proc_stats_io_write_rate = Gauge('proc_stats_io_write_rate', 'Bytes written on the specified io device')
-    #------------------------------------------------------------------------------------------------------------
-
-    #------------------------------------------------ sys_stats -------------------------------------------------
-    sys_stats_cpu_package_temp = Gauge('sys_stats_cpu_package_temp', 'Current CPU package temperature')
-    # core and memory usage statistics are only supported on Nvidia GPUs for now
-    if GPU_TYPE == SUPPORTED_GPU_TYPES[0]:
-        sys_stats_gpu_usage = Gauge('sys_stats_gpu_usage', 'Average GPU core usage')
-        sys_stats_gpu_memory_usage = Gauge('sys_stats_gpu_memory_usage', 'Amount of used GPU memory')
-    if GPU_TYPE in SUPPORTED_GPU_TYPES:
-        sys_stats_gpu_temp = Gauge('sys_stats_gpu_temp', 'Current GPU temperature')
-    if NVME_DEVICE_NAME in IO_DEVICE:
-        sys_stats_nvme_composite_temp = Gauge('sys_stats_nvme_composite_temp', 'Current NVMe composite temperature')
-    #------------------------------------------------------------------------------------------------------------
+    # raw shared memory, written by the collection loop below and read
+    # by the metrics server process whenever a scrape comes in
+    metrics_array = multiprocessing.Array('d', METRICS_ARRAY_SIZE, lock=False)
 
     #############################################################################################################
 
-    # start a Prometheus http server thread to expose the metrics
-    start_http_server(PROMETHEUS_CLIENT_PORT)
+    # serve the metrics from a separate process, keeping scrape handling
+    # off the collection loop's scheduling domain entirely
+    metrics_server_process = multiprocessing.Process(target=start_metrics_server,
+                                                     args=(PROMETHEUS_CLIENT_PORT, metrics_array,
+                                                           GPU_TYPE, IO_DEVICE),
+                                                     daemon=True)
+    metrics_server_process.start()
+
+    collection_timer_fd = create_collection_timer(STATS_COLLECTION_INTERVAL)
+
+    # precomputed to turn the per-second rate divisions into multiplications
+    collection_interval_multiplier = 1 / STATS_COLLECTION_INTERVAL
 
     terminate_signal = False
+    first_cycle = True
 
     while not terminate_signal:
         try:
             os_stats_inst.collect_stats()
 
-            proc_stats_avg_cpu_usage.set(os_stats_inst.avg_cpu_usage)
-            proc_stats_memory_load.set(os_stats_inst.memory_load)
-            proc_stats_uptime.set(os_stats_inst.uptime)
-            # always report average rates per second, regardless of collection interval
-            proc_stats_rec_rate.set(os_stats_inst.net_rec_rate / STATS_COLLECTION_INTERVAL)
-            proc_stats_trans_rate.set(os_stats_inst.net_trans_rate / STATS_COLLECTION_INTERVAL)
-            proc_stats_io_read_rate.set(os_stats_inst.io_bytes_read / STATS_COLLECTION_INTERVAL)
-            proc_stats_io_write_rate.set(os_stats_inst.io_bytes_written / STATS_COLLECTION_INTERVAL)
-
-            sys_stats_cpu_package_temp.set(os_stats_inst.cpu_package_temp)
+            metrics_array[AVG_CPU_USAGE] = os_stats_inst.avg_cpu_usage
+            metrics_array[MEMORY_LOAD] = os_stats_inst.memory_load
+            metrics_array[UPTIME] = os_stats_inst.uptime
+            if first_cycle:
+                # there's no delta to report on the first pass, so leave the
+                # rates unpublished instead of exposing a fake 0 sample
+                first_cycle = False
+            else:
+                # always report average rates per second, regardless of collection interval
+                metrics_array[NET_REC_RATE] = os_stats_inst.net_rec_rate * collection_interval_multiplier
+                metrics_array[NET_TRANS_RATE] = os_stats_inst.net_trans_rate * collection_interval_multiplier
+                metrics_array[IO_READ_RATE] = os_stats_inst.io_bytes_read * collection_interval_multiplier
+                metrics_array[IO_WRITE_RATE] = os_stats_inst.io_bytes_written * collection_interval_multiplier
+                metrics_array[RATES_VALID] = 1
+
+            metrics_array[CPU_PACKAGE_TEMP] = os_stats_inst.cpu_package_temp
             # core and memory usage statistics are only supported on Nvidia GPUs for now
             if GPU_TYPE == SUPPORTED_GPU_TYPES[0]:
-                sys_stats_gpu_usage.set(os_stats_inst.gpu_usage)
-                sys_stats_gpu_memory_usage.set(os_stats_inst.gpu_memory_usage)
+                metrics_array[GPU_USAGE] = os_stats_inst.gpu_usage
+                metrics_array[GPU_MEMORY_USAGE] = os_stats_inst.gpu_memory_usage
             if GPU_TYPE in SUPPORTED_GPU_TYPES:
-                sys_stats_gpu_temp.set(os_stats_inst.gpu_temp)
+                metrics_array[GPU_TEMP] = os_stats_inst.gpu_temp
             if NVME_DEVICE_NAME in IO_DEVICE:
-                sys_stats_nvme_composite_temp.set(os_stats_inst.nvme_composite_temp)
+                metrics_array[NVME_COMPOSITE_TEMP] = os_stats_inst.nvme_composite_temp
 
-            sleep(STATS_COLLECTION_INTERVAL)
+            # block until the next timer tick - unlike a relative sleep,
+            # the cadence won't drift with the duration of the collection
+            os.read(collection_timer_fd, 8)
 
         except SystemExit:
             print('Stopping flameglow...')
             terminate_signal = True
 
         except:
-            os_stats_inst.clear_stats()
+            # since the metric updates are skipped on collection errors,
+            # the previous cycle's values will remain published until the
+            # next successful collection - preferable to reporting fake 0s
+            pass
 
     print(f'\n\nThank you for using flameglow. Bye!')
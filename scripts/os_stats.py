@@ -4,26 +4,36 @@
 @version: 2.32
 @date: 30/10/2024
 
-Warning: Built for use with python 3.6+
+Warning: Built for use with python 3.7+
 '''
 
 import logging
 import os
-import subprocess
+import re
 import json
+import atexit
 from logging.handlers import RotatingFileHandler
 # uncomment for debugging purposes only
 #import traceback
 
 # logging configuration block
 LOG_FILE_PATH = os.path.join('..', 'logs', 'os_stats.log')
-logger_file_handler = RotatingFileHandler(LOG_FILE_PATH, maxBytes=25165824, backupCount=1, encoding='utf-8')
 LOGGER_FORMAT = '%(asctime)s %(levelname)s : %(name)s >>> %(message)s'
-logger_file_handler.setFormatter(logging.Formatter(LOGGER_FORMAT))
-# logging level for other modules
-logging.basicConfig(format=LOGGER_FORMAT, level=logging.ERROR)
 logger = logging.getLogger(__name__)
-logger.addHandler(logger_file_handler)
+
+def _setup_logging():
+    # deferred to first instantiation, so that simply importing the
+    # module doesn't pay for (CWD-dependent) handler construction
+    if not logger.handlers:
+        logger_file_handler = RotatingFileHandler(LOG_FILE_PATH, maxBytes=25165824, backupCount=1,
+                                                  encoding='utf-8', delay=True)
+        logger_file_handler.setFormatter(logging.Formatter(LOGGER_FORMAT))
+        # logging level for other modules
+        logging.basicConfig(format=LOGGER_FORMAT, level=logging.ERROR)
+        logger.addHandler(logger_file_handler)
+
+# detection cache file block
+DETECTION_CACHE_PATH = os.path.join('..', 'logs', 'detection_cache.json')
 
 PROC_LOADAVG_PATH = '/proc/loadavg'
 PROC_MEMINFO_PATH = '/proc/meminfo'
@@ -33,32 +43,55 @@ PROC_IO_DEV_PATH = '/proc/diskstats'
 
 SYS_RASPBERRY_PI_HOST_TYPE = 'raspberrypi'
 SYS_CPU_THERMAL_ZONE_TYPE_PI = 'cpu-thermal'
+SYS_GPU_THERMAL_ZONE_TYPE_PI = 'gpu-thermal'
 SYS_CPU_THERMAL_ZONE_TYPE_GENERIC = 'x86_pkg_temp'
 # could possibly add intel dGPU support in the future
 SYS_GPU_CARD_TYPES = ('amdgpu')
 
 IO_SECTOR_SIZE = 512
 
+# matches both meminfo fields of interest in one C-level buffer scan
+MEMINFO_FALLBACK_REGEX = re.compile(rb'^(MemTotal|MemAvailable):\s+(\d+)', re.MULTILINE)
+
 # could possibly add intel dGPU support in the future
 GPU_TYPES = ('nvidia', 'amd', 'raspberrypi')
-IO_SERIAL_NAME_COMMAND = ['lsblk', '--nodeps', '-J', '-o', 'name,serial']
-NVIDIA_GPU_STATS_COMMAND = ['nvidia-smi', '--query-gpu=utilization.gpu,memory.used,temperature.gpu', 
-                            '--format=csv,noheader']
-RPI_GPU_TEMP_COMMAND = ['vcgencmd', 'measure_temp']
 
 class os_stats:
     '''gather host stats using the /proc and /sys OS stat modules'''
 
-    _logging_level = logging.WARNING
+    # fixed attribute slots cut per-instance memory and turn the dict
+    # lookups on the hot collection path into slot descriptor accesses
+    __slots__ = ('_net_intf', '_net_intf_bytes', '_net_intf_index', '_net_intf_regex',
+                 '_net_intf_bytes_rec_prev', '_net_intf_bytes_trans_prev',
+                 '_net_intf_bytes_rec', '_net_intf_bytes_trans',
+                 '_io_device', '_io_device_bytes', '_io_device_regex',
+                 '_io_device_sectors_read_prev', '_io_device_sectors_written_prev',
+                 '_io_device_sectors_read', '_io_device_sectors_written',
+                 '_cpu_thermal_zone_id', '_nvme_drive_id', '_nvme_hwmon_id',
+                 '_gpu_card_id', '_gpu_hwmon_id',
+                 '_cpu_temp_path', '_nvme_temp_path', '_gpu_temp_path',
+                 '_cpu_thermal_zone_type', '_collect_gpu_stats',
+                 '_pynvml', '_nvml_handle',
+                 '_read_buffer', '_proc_fds',
+                 '_logging_level', '_host_type', '_gpu_type',
+                 'avg_cpu_usage', 'memory_load', 'uptime',
+                 'net_rec_rate', 'net_trans_rate', 'io_bytes_read', 'io_bytes_written',
+                 'gpu_usage', 'gpu_memory_usage',
+                 'cpu_package_temp', 'nvme_composite_temp', 'gpu_temp')
 
     def __init__(self, host_type, gpu_type, logging_level):
         self._net_intf = None
+        self._net_intf_bytes = None
+        self._net_intf_index = None
+        self._net_intf_regex = None
         self._net_intf_bytes_rec_prev = None
         self._net_intf_bytes_trans_prev = None
         self._net_intf_bytes_rec = 0
         self._net_intf_bytes_trans = 0
 
         self._io_device = None
+        self._io_device_bytes = None
+        self._io_device_regex = None
         self._io_device_sectors_read_prev = None
         self._io_device_sectors_written_prev = None
         self._io_device_sectors_read = 0
@@ -70,6 +103,11 @@ class os_stats:
         self._gpu_card_id = None
         self._gpu_hwmon_id = None
 
+        # temp paths are built once at detection time, not on every cycle
+        self._cpu_temp_path = None
+        self._nvme_temp_path = None
+        self._gpu_temp_path = None
+
         self.avg_cpu_usage = 0
         self.memory_load = 0
         self.uptime = 0
@@ -91,127 +129,349 @@ class os_stats:
             self._logging_level = logging.DEBUG
         elif logging_level == 'INFO':
             self._logging_level = logging.INFO
+        else:
+            self._logging_level = logging.WARNING
 
         self._host_type = host_type
         self._gpu_type = gpu_type
 
+        # the expected thermal zone type and the GPU stats collection
+        # strategy are both fixed at startup, so resolve them once here
+        # rather than re-comparing type strings on every cycle
+        if host_type == SYS_RASPBERRY_PI_HOST_TYPE:
+            self._cpu_thermal_zone_type = SYS_CPU_THERMAL_ZONE_TYPE_PI
+        else:
+            self._cpu_thermal_zone_type = SYS_CPU_THERMAL_ZONE_TYPE_GENERIC
+
+        self._collect_gpu_stats = {GPU_TYPES[0]: self._collect_gpu_stats_nvidia,
+                                   GPU_TYPES[1]: self._collect_gpu_stats_amd,
+                                   GPU_TYPES[2]: self._collect_gpu_stats_rpi}.get(gpu_type,
+                                                                                  self._collect_gpu_stats_none)
+
+        # preallocated buffer used for single-syscall procfs/sysfs reads -
+        # sized generously, since /proc/net/dev and /proc/diskstats can
+        # grow well past 8K on hosts with many interfaces/devices
+        self._read_buffer = bytearray(16384)
+        # procfs/sysfs file descriptors, cached across collection cycles
+        self._proc_fds = {}
+
+        _setup_logging()
         # logging level for current logger
         logger.setLevel(self._logging_level)
 
-        self.detect_cpu_thermal_zone_path()
-        self.detect_nvme_path()
-        if self._gpu_type == GPU_TYPES[1]:
-            self.detect_gpu_path()
+        # skip the sysfs directory walks for any paths which a previous
+        # run has already resolved (and cached) on this host - sensors
+        # the cache holds nothing for are re-detected on every start, so
+        # hardware that shows up later is still picked up eventually
+        self._load_detection_cache()
+
+        if self._cpu_temp_path is None:
+            self.detect_cpu_thermal_zone_path()
+        if self._nvme_temp_path is None:
+            self.detect_nvme_path()
+        if self._gpu_temp_path is None:
+            if self._gpu_type == GPU_TYPES[1]:
+                self.detect_gpu_path()
+            elif self._gpu_type == GPU_TYPES[2]:
+                self.detect_rpi_gpu_thermal_zone_path()
+        self._save_detection_cache()
+
+        if self._gpu_type == GPU_TYPES[0]:
+            self.init_nvidia_gpu_bindings()
+
+        atexit.register(self.close)
+
+    def init_nvidia_gpu_bindings(self):
+        logger.info('Initializing NVML bindings for the Nvidia GPU...')
+
+        # query the Nvidia driver in-process through the NVML library
+        # instead of forking an nvidia-smi process on every cycle
+        try:
+            import pynvml
+
+            pynvml.nvmlInit()
+            self._pynvml = pynvml
+            self._nvml_handle = pynvml.nvmlDeviceGetHandleByIndex(0)
+            atexit.register(pynvml.nvmlShutdown)
+
+            logger.info('Succesfully initialized NVML bindings.')
+        except:
+            self._pynvml = None
+            self._nvml_handle = None
+            logger.warning('NVML bindings could not be initialized.')
 
     def set_network_interface(self, net_intf):
         self._net_intf = net_intf
+        self._net_intf_bytes = net_intf.encode()
+        self._net_intf_index = None
+        # used to locate the interface line without a python-level loop -
+        # partial interface names are matched at the start of a field only
+        self._net_intf_regex = re.compile(rb'^\s*(' + re.escape(self._net_intf_bytes) + rb')',
+                                          re.MULTILINE)
+
+    def _read_proc_file(self, path):
+        # procfs/sysfs contents can change mid-read, so pull in the entire
+        # file with a single read syscall into the preallocated buffer -
+        # file descriptors are opened on first use and kept open across
+        # collection cycles to skip the open/close syscall pair afterwards
+        fd = self._proc_fds.get(path)
+        if fd is None:
+            fd = os.open(path, os.O_RDONLY)
+            self._proc_fds[path] = fd
+        bytes_read = os.preadv(fd, (self._read_buffer,), 0)
+
+        if bytes_read == len(self._read_buffer):
+            logger.warning('Buffer-sized read from %s - contents may be truncated.', path)
+
+        return self._read_buffer[:bytes_read]
+
+    def close(self):
+        for fd in self._proc_fds.values():
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        self._proc_fds.clear()
         
     def get_io_device(self):
         return self._io_device
 
     def set_io_device(self, io_device):
-        # i/o device serial numbers can be used as a more strict identifier
+        # i/o device serial numbers can be used as a more strict identifier -
+        # serials are read out of /sys/block where the driver exposes them
+        # (NVMe uses device/serial, virtio-blk a toplevel serial attribute);
+        # SATA/SCSI serials only exist in udev and can't be resolved here
+        serial_matched = False
+        block_device_names = []
+
         try:
-            lsblk_output_raw = subprocess.run(IO_SERIAL_NAME_COMMAND, capture_output=True,
-                                              text=True, check=True)
-            lsblk_output = json.loads(lsblk_output_raw.stdout)
-            
-            for block_device in lsblk_output['blockdevices']:
-                block_device_name = block_device['name']
-                block_device_serial = block_device['serial']
-                
-                logger.debug(f'Found I/O device {block_device_name} with serial number {block_device_serial}.')
-                
-                if block_device_serial == io_device:
-                    logger.info(f'I/O device name set to {block_device_name}.')
-                    self._io_device = block_device_name
-                    return
+            with os.scandir('/sys/block') as block_devices:
+                for block_device in sorted(block_devices, key=lambda device: device.name):
+                    block_device_names.append(block_device.name)
+                    block_device_serial = None
+
+                    for serial_path in (f'{block_device.path}/device/serial',
+                                        f'{block_device.path}/serial'):
+                        try:
+                            with open(serial_path, 'r') as serial:
+                                block_device_serial = serial.read().strip()
+                                break
+                        except OSError:
+                            continue
+
+                    if block_device_serial is None:
+                        continue
+
+                    logger.debug('Found I/O device %s with serial number %s.',
+                                 block_device.name, block_device_serial)
+
+                    if block_device_serial == io_device:
+                        logger.info('I/O device name set to %s.', block_device.name)
+                        io_device = block_device.name
+                        serial_matched = True
+                        break
         except:
             pass
-            
-        self._io_device = io_device
 
-    def detect_cpu_thermal_zone_path(self):
-        logger.info(f'Detecting CPU package thermal zone for {self._host_type} host type...')
+        # a value which is neither a known serial nor an existing device
+        # name will never match anything in /proc/diskstats - called out
+        # here, since the i/o rates would otherwise just flatline silently
+        if not serial_matched and io_device not in block_device_names:
+            logger.warning('I/O device %s matches no block device name or sysfs serial.', io_device)
 
-        thermal_zone_no = 0
+        self._io_device = io_device
+        self._io_device_bytes = io_device.encode()
+        # anchors the device name at its diskstats column and captures the
+        # sectors read/written fields, so an 'sda' filter can no longer
+        # accidentally match 'sdaa' or one of the device's partitions
+        self._io_device_regex = re.compile(rb'^\s*\d+\s+\d+\s+' + re.escape(self._io_device_bytes) +
+                                           rb'\s+\d+\s+\d+\s+(\d+)(?:\s+\d+){3}\s+(\d+)',
+                                           re.MULTILINE)
+
+    def _load_detection_cache(self):
+        # sysfs layouts are stable on any given host, so the paths resolved
+        # by a previous run can be reused, after checking they still exist
+        try:
+            with open(DETECTION_CACHE_PATH, 'r') as detection_cache_file:
+                detection_cache = json.load(detection_cache_file)
+
+            if (detection_cache['host_type'] != self._host_type or
+                detection_cache['gpu_type'] != self._gpu_type):
+                logger.info('Discarding the detection cache due to a host/GPU type change.')
+                return False
+
+            cpu_temp_path = detection_cache['cpu_temp_path']
+            nvme_temp_path = detection_cache['nvme_temp_path']
+            gpu_temp_path = detection_cache['gpu_temp_path']
+
+            # thermal zone numbering is not stable across boots, so confirm
+            # the cached zone still reports the expected sensor type rather
+            # than trusting a bare existence check
+            if cpu_temp_path is not None:
+                with open(f'{cpu_temp_path[:-5]}/type', 'r') as zone_type:
+                    if zone_type.read().strip() != self._cpu_thermal_zone_type:
+                        logger.info('Discarding the detection cache due to a thermal zone change.')
+                        return False
+
+            if gpu_temp_path is not None and self._gpu_type == GPU_TYPES[2]:
+                with open(f'{gpu_temp_path[:-5]}/type', 'r') as zone_type:
+                    if zone_type.read().strip() not in (SYS_GPU_THERMAL_ZONE_TYPE_PI,
+                                                        SYS_CPU_THERMAL_ZONE_TYPE_PI):
+                        logger.info('Discarding the detection cache due to a thermal zone change.')
+                        return False
+
+            for cached_path in (nvme_temp_path, gpu_temp_path):
+                if cached_path is not None and not os.path.exists(cached_path):
+                    logger.info('Discarding the detection cache due to a stale path.')
+                    return False
+
+            self._cpu_temp_path = cpu_temp_path
+            self._nvme_temp_path = nvme_temp_path
+            self._gpu_temp_path = gpu_temp_path
+
+            if cpu_temp_path is not None or nvme_temp_path is not None or gpu_temp_path is not None:
+                logger.info('Reusing cached detection paths.')
+            return True
 
-        while os.path.exists(f'/sys/class/thermal/thermal_zone{thermal_zone_no}'):
-            logger.debug(f'Atempting CPU package thermal zone detection for: {thermal_zone_no}...')
+        except:
+            return False
 
-            with open(f'/sys/class/thermal/thermal_zone{thermal_zone_no}/type', 'r') as zone_type:
-                detected_zone_type = zone_type.read().strip()
-                logger.debug(f'detected_zone_type: {detected_zone_type}')
+    def _save_detection_cache(self):
+        # an all-empty cache would only memoize the absence of sensors,
+        # preventing their pickup once they do show up - don't persist it
+        if (self._cpu_temp_path is None and self._nvme_temp_path is None
+            and self._gpu_temp_path is None):
+            return
 
-                if self._host_type != SYS_RASPBERRY_PI_HOST_TYPE:
-                    if detected_zone_type == SYS_CPU_THERMAL_ZONE_TYPE_GENERIC:
-                        self._cpu_thermal_zone_id = thermal_zone_no
-                        logger.info('Succesfully detected CPU package thermal zone.')
-                        return
-                else:
-                    if detected_zone_type == SYS_CPU_THERMAL_ZONE_TYPE_PI:
-                        self._cpu_thermal_zone_id = thermal_zone_no
-                        logger.info('Succesfully detected CPU package thermal zone.')
-                        return
+        try:
+            with open(DETECTION_CACHE_PATH, 'w') as detection_cache_file:
+                json.dump({'host_type': self._host_type,
+                           'gpu_type': self._gpu_type,
+                           'cpu_temp_path': self._cpu_temp_path,
+                           'nvme_temp_path': self._nvme_temp_path,
+                           'gpu_temp_path': self._gpu_temp_path},
+                          detection_cache_file)
+        except:
+            logger.warning('The detection cache could not be persisted.')
 
-                thermal_zone_no += 1
+    def detect_cpu_thermal_zone_path(self):
+        logger.info('Detecting CPU package thermal zone for %s host type...', self._host_type)
+
+        # a single directory scan enumerates only the thermal zones which
+        # actually exist, instead of probing paths one by one
+        if os.path.exists('/sys/class/thermal'):
+            with os.scandir('/sys/class/thermal') as thermal_zones:
+                for thermal_zone in sorted(thermal_zones, key=lambda zone: zone.name):
+                    if not thermal_zone.name.startswith('thermal_zone'):
+                        continue
+
+                    logger.debug('Atempting CPU package thermal zone detection for: %s...', thermal_zone.name)
+
+                    with open(f'{thermal_zone.path}/type', 'r') as zone_type:
+                        detected_zone_type = zone_type.read().strip()
+                        logger.debug('detected_zone_type: %s', detected_zone_type)
+
+                        if detected_zone_type == self._cpu_thermal_zone_type:
+                            self._cpu_thermal_zone_id = thermal_zone.name[12:]
+                            self._cpu_temp_path = f'{thermal_zone.path}/temp'
+                            logger.info('Succesfully detected CPU package thermal zone.')
+                            return
 
         logger.warning('CPU thermal zones have been exhausted without detection.')
 
     def detect_nvme_path(self):
-        logger.info(f'Detecting NVMe composite thermal readings...')
+        logger.info('Detecting NVMe composite thermal readings...')
 
-        nvme_no = 0
+        if os.path.exists('/sys/class/nvme'):
+            with os.scandir('/sys/class/nvme') as nvme_drives:
+                for nvme_drive in sorted(nvme_drives, key=lambda drive: drive.name):
+                    if not nvme_drive.name.startswith('nvme'):
+                        continue
 
-        while os.path.exists(f'/sys/class/nvme/nvme{nvme_no}'):
-            logger.debug(f'Atempting NVMe hwmon detection for nvme: {nvme_no}...')
+                    logger.debug('Atempting NVMe hwmon detection for: %s...', nvme_drive.name)
 
-            with os.scandir(f'/sys/class/nvme/nvme{nvme_no}') as hwmon_path:
-                for hwmon_path_entry in hwmon_path:
-                    if hwmon_path_entry.name.startswith('hwmon') and hwmon_path_entry.is_dir():
-                        logger.debug(f'Atempting NVMe temp input detection for: {hwmon_path_entry.name}...')
+                    with os.scandir(nvme_drive.path) as hwmon_path:
+                        for hwmon_path_entry in hwmon_path:
+                            if hwmon_path_entry.name.startswith('hwmon') and hwmon_path_entry.is_dir():
+                                logger.debug('Atempting NVMe temp input detection for: %s...',
+                                             hwmon_path_entry.name)
 
-                        if os.path.exists(f'/sys/class/nvme/nvme{nvme_no}/{hwmon_path_entry.name}/temp1_input'):
-                            self._nvme_drive_id = nvme_no
-                            logger.debug(f'nvme_no: {nvme_no}')
+                                if os.path.exists(f'{hwmon_path_entry.path}/temp1_input'):
+                                    self._nvme_drive_id = nvme_drive.name[4:]
+                                    logger.debug('nvme_no: %s', self._nvme_drive_id)
 
-                            detected_hwmon_no = hwmon_path_entry.name[5:]
-                            self._nvme_hwmon_id = detected_hwmon_no
-                            logger.debug(f'detected_hwmon_no: {detected_hwmon_no}')
+                                    detected_hwmon_no = hwmon_path_entry.name[5:]
+                                    self._nvme_hwmon_id = detected_hwmon_no
+                                    logger.debug('detected_hwmon_no: %s', detected_hwmon_no)
 
-                            logger.info('Succesfully detected NVMe hwmon path.')
-                            return
+                                    self._nvme_temp_path = f'{hwmon_path_entry.path}/temp1_input'
 
-            nvme_no += 1
+                                    logger.info('Succesfully detected NVMe hwmon path.')
+                                    return
 
         logger.info('No NVMe devices with thermal readings have been detected.')
 
+    def detect_rpi_gpu_thermal_zone_path(self):
+        logger.info('Detecting GPU thermal zone for %s GPU type...', self._gpu_type)
+
+        if os.path.exists('/sys/class/thermal'):
+            with os.scandir('/sys/class/thermal') as thermal_zones:
+                for thermal_zone in sorted(thermal_zones, key=lambda zone: zone.name):
+                    if not thermal_zone.name.startswith('thermal_zone'):
+                        continue
+
+                    logger.debug('Atempting GPU thermal zone detection for: %s...', thermal_zone.name)
+
+                    with open(f'{thermal_zone.path}/type', 'r') as zone_type:
+                        detected_zone_type = zone_type.read().strip()
+                        logger.debug('detected_zone_type: %s', detected_zone_type)
+
+                        if detected_zone_type == SYS_GPU_THERMAL_ZONE_TYPE_PI:
+                            self._gpu_temp_path = f'{thermal_zone.path}/temp'
+                            logger.info('Succesfully detected GPU thermal zone.')
+                            return
+
+        # the GPU shares the SoC die with the CPU, and older kernels only
+        # expose the shared sensor through the cpu-thermal zone
+        if self._cpu_temp_path is not None:
+            self._gpu_temp_path = self._cpu_temp_path
+            logger.info('Falling back to the CPU thermal zone for GPU temperature readings.')
+        else:
+            logger.warning('GPU thermal zones have been exhausted without detection.')
+
     def detect_gpu_path(self):
-        logger.info(f'Detecting GPU thermal readings for {self._gpu_type} GPU type...')
+        logger.info('Detecting GPU thermal readings for %s GPU type...', self._gpu_type)
+
+        if os.path.exists('/sys/class/drm'):
+            with os.scandir('/sys/class/drm') as drm_cards:
+                for drm_card in sorted(drm_cards, key=lambda card: card.name):
+                    # skip connector entries such as card0-DP-1
+                    if not drm_card.name.startswith('card') or not drm_card.name[4:].isdigit():
+                        continue
 
-        card_no = 0
+                    logger.debug('Atempting GPU card detection for: %s...', drm_card.name)
 
-        while os.path.exists(f'/sys/class/drm/card{card_no}'):
-            logger.debug(f'Atempting GPU card detection for card: {card_no}...')
+                    if not os.path.exists(f'{drm_card.path}/device/hwmon'):
+                        continue
 
-            with os.scandir(f'sys/class/drm/card{card_no}/device/hwmon') as hwmon_path:
-                for hwmon_path_entry in hwmon_path:
-                    if hwmon_path_entry.name.startswith('hwmon') and hwmon_path_entry.is_dir():
-                        logger.debug(f'Atempting GPU card detection for: {hwmon_path_entry.name}...')
+                    with os.scandir(f'{drm_card.path}/device/hwmon') as hwmon_path:
+                        for hwmon_path_entry in hwmon_path:
+                            if hwmon_path_entry.name.startswith('hwmon') and hwmon_path_entry.is_dir():
+                                logger.debug('Atempting GPU card detection for: %s...', hwmon_path_entry.name)
 
-                        detected_hwmon_no = hwmon_path_entry.name[5:]
-                        logger.debug(f'detected_hwmon_no: {detected_hwmon_no}')
+                                detected_hwmon_no = hwmon_path_entry.name[5:]
+                                logger.debug('detected_hwmon_no: %s', detected_hwmon_no)
 
-                        with open(f'/sys/class/drm/card{card_no}'
-                                  f'/device/hwmon/hwmon{detected_hwmon_no}/name', 'r') as card_name:
-                            detected_card_name = card_name.read().strip()
-                            logger.debug(f'detected_card_name: {detected_card_name}')
+                                with open(f'{hwmon_path_entry.path}/name', 'r') as card_name:
+                                    detected_card_name = card_name.read().strip()
+                                    logger.debug('detected_card_name: %s', detected_card_name)
 
-                            if detected_card_name in SYS_GPU_CARD_TYPES:
-                                self._gpu_card_id = card_no
-                                self._gpu_hwmon_id = detected_hwmon_no
-                                logger.info('Succesfully detected GPU card.')
-                                return
+                                    if detected_card_name in SYS_GPU_CARD_TYPES:
+                                        self._gpu_card_id = drm_card.name[4:]
+                                        self._gpu_hwmon_id = detected_hwmon_no
+                                        self._gpu_temp_path = f'{hwmon_path_entry.path}/temp1_input'
+                                        logger.info('Succesfully detected GPU card.')
+                                        return
 
         logger.warning('No DRM cards with thermal readings have been detected.')
 
@@ -237,181 +497,195 @@ class os_stats:
         self.nvme_composite_temp = 0
         self.gpu_temp = 0
 
+    def _collect_gpu_stats_nvidia(self):
+        # NVML library queries
+        try:
+            # returned GPU usage will be a integer percentage
+            self.gpu_usage = self._pynvml.nvmlDeviceGetUtilizationRates(self._nvml_handle).gpu
+            # align with the MiB values previously reported by nvidia-smi
+            self.gpu_memory_usage = self._pynvml.nvmlDeviceGetMemoryInfo(self._nvml_handle).used >> 20
+            # multiply by 1000 to align with sys sensor readings default format
+            self.gpu_temp = self._pynvml.nvmlDeviceGetTemperature(self._nvml_handle,
+                                                                  self._pynvml.NVML_TEMPERATURE_GPU) * 1000
+        except:
+            self.gpu_usage = 0
+            self.gpu_memory_usage = 0
+            self.gpu_temp = 0
+            logger.warning('NVML could not communicate with the Nvidia driver.')
+
+        logger.debug('gpu_usage: %s', self.gpu_usage)
+        logger.debug('gpu_memory_usage: %s', self.gpu_memory_usage)
+        logger.debug('gpu_temp: %s', self.gpu_temp)
+
+    def _collect_gpu_stats_amd(self):
+        # /sys/class/drm/card*/device/hwmon/hwmon*/temp1_input file parsing
+        if self._gpu_temp_path is not None:
+            self.gpu_temp = int(self._read_proc_file(self._gpu_temp_path))
+
+            logger.debug('gpu_temp: %s', self.gpu_temp)
+        else:
+            logger.debug('Skipping GPU temperature collection.')
+
+    def _collect_gpu_stats_rpi(self):
+        # /sys/class/thermal/thermal_zone*/temp file parsing
+        if self._gpu_temp_path is not None:
+            self.gpu_temp = int(self._read_proc_file(self._gpu_temp_path))
+
+            logger.debug('gpu_temp: %s', self.gpu_temp)
+        else:
+            logger.debug('Skipping GPU temperature collection.')
+
+    def _collect_gpu_stats_none(self):
+        logger.debug('No supported GPU type detected. Skipping GPU stats collection.')
+
     def collect_stats(self):
         logger.info('***** Starting data collection run *****')
 
         try:
-            # /proc/loadavg file parsing
-            with open(PROC_LOADAVG_PATH, 'r') as loadavg:
-                self.avg_cpu_usage = loadavg.read().split()[0]
-
-                logger.debug(f'avg_cpu_usage: {self.avg_cpu_usage}')
+            # snapshot all the procfs files back to back before parsing
+            # anything - coalescing the reads keeps the per-cycle syscall
+            # burst short and the collected data as coherent as possible
+            # (a single readv can't span multiple fds, so consecutive
+            # preads are the closest available equivalent)
+            loadavg = self._read_proc_file(PROC_LOADAVG_PATH)
+            meminfo = self._read_proc_file(PROC_MEMINFO_PATH)
+            uptime = self._read_proc_file(PROC_UPTIME_PATH)
+            net_dev = self._read_proc_file(PROC_NET_DEV_PATH)
+            disk_stats = self._read_proc_file(PROC_IO_DEV_PATH)
+
+            # /proc/loadavg file parsing - only the first field is of
+            # interest, so there's no need to split up the others
+            self.avg_cpu_usage = float(loadavg[:loadavg.find(b' ')])
+
+            logger.debug('avg_cpu_usage: %s', self.avg_cpu_usage)
 
             # /proc/meminfo file parsing
-            with open(PROC_MEMINFO_PATH, 'r') as meminfo:
-                memory_total = 0
-                memory_available = 0
-
-                for line in meminfo.read().splitlines():
-                    if line.startswith('MemTotal'):
-                        memory_total = line.split(':')[1].strip().split()[0]
-                    elif line.startswith('MemAvailable'):
-                        memory_available = line.split(':')[1].strip().split()[0]
-                    if memory_total != 0 and memory_available != 0:
-                        break
+            # the kernel always writes MemTotal on the first line and
+            # MemAvailable on the third, so parse the values by position
+            meminfo_lines = meminfo.split(b'\n', 3)
+
+            if meminfo_lines[0].startswith(b'MemTotal') and meminfo_lines[2].startswith(b'MemAvailable'):
+                # slice out the values between the field labels and the
+                # ' kB' suffixes - int() tolerates the leftover whitespace
+                memory_total = meminfo_lines[0][9:-3]
+                memory_available = meminfo_lines[2][13:-3]
+            else:
+                # fall back to a full regex scan if the expected layout ever changes
+                meminfo_values = dict(MEMINFO_FALLBACK_REGEX.findall(meminfo))
+                memory_total = meminfo_values[b'MemTotal']
+                memory_available = meminfo_values[b'MemAvailable']
 
-                self.memory_load = int(memory_total) - int(memory_available)
+            self.memory_load = int(memory_total) - int(memory_available)
 
-                logger.debug(f'memory_load: {self.memory_load}')
+            logger.debug('memory_load: %s', self.memory_load)
 
-            # /proc/uptime file parsing
-            with open(PROC_UPTIME_PATH, 'r') as uptime:
-                self.uptime = int(float(uptime.read().split()[0]))
+            # /proc/uptime file parsing - only whole seconds are reported,
+            # so slice up to the decimal point and skip the float parse
+            self.uptime = int(uptime[:uptime.find(b'.')])
 
-                logger.debug(f'uptime: {self.uptime}')
+            logger.debug('uptime: %s', self.uptime)
 
             # /proc/net/dev file parsing
-            with open(PROC_NET_DEV_PATH, 'r') as net_dev:
-                for line in net_dev.read().splitlines():
-                    if line.lstrip().startswith(self._net_intf):
-                        intf_line = line.split(':')[1].split()
-                        self._net_intf_bytes_rec = int(intf_line[0])
-                        self._net_intf_bytes_trans = int(intf_line[8])
-                        break
+            # the interface line sits at a stable byte offset within a run,
+            # so cache it and only rescan if the verification fails - the
+            # preceding byte must be a field boundary, otherwise a shifted
+            # buffer could line the offset up inside another interface's
+            # name (e.g. the eth0 in veth0) and silently bind to its line
+            intf_index = self._net_intf_index
+
+            if (intf_index is None or intf_index >= len(net_dev)
+                or net_dev[intf_index - 1] not in b' \n'
+                or not net_dev.startswith(self._net_intf_bytes, intf_index)):
+                intf_match = self._net_intf_regex.search(net_dev)
+                intf_index = intf_match.start(1) if intf_match is not None else -1
+
+                self._net_intf_index = intf_index if intf_index > 0 else None
+
+            if intf_index > 0:
+                intf_line = net_dev[net_dev.find(b':', intf_index) + 1:
+                                    net_dev.find(b'\n', intf_index)].split()
+                self._net_intf_bytes_rec = int(intf_line[0])
+                self._net_intf_bytes_trans = int(intf_line[8])
+
+            logger.debug('_net_intf_bytes_rec: %s', self._net_intf_bytes_rec)
+            logger.debug('_net_intf_bytes_trans: %s', self._net_intf_bytes_trans)
+
+            logger.debug('_net_intf_bytes_rec_prev: %s', self._net_intf_bytes_rec_prev)
+            logger.debug('_net_intf_bytes_trans_prev: %s', self._net_intf_bytes_trans_prev)
+
+            # won't do a delta on the first pass, so return 0
+            if self._net_intf_bytes_rec_prev is None and self._net_intf_bytes_trans_prev is None:
+                self.net_rec_rate = 0
+                self.net_trans_rate = 0
+            else:
+                self.net_rec_rate = self._net_intf_bytes_rec - self._net_intf_bytes_rec_prev
+                self.net_trans_rate = self._net_intf_bytes_trans - self._net_intf_bytes_trans_prev
 
-                logger.debug(f'_net_intf_bytes_rec: {self._net_intf_bytes_rec}')
-                logger.debug(f'_net_intf_bytes_trans: {self._net_intf_bytes_trans}')
-
-                logger.debug(f'_net_intf_bytes_rec_prev: {self._net_intf_bytes_rec_prev}')
-                logger.debug(f'_net_intf_bytes_trans_prev: {self._net_intf_bytes_trans_prev}')
-
-                # won't do a delta on the first pass, so return 0
-                if self._net_intf_bytes_rec_prev is None and self._net_intf_bytes_trans_prev is None:
-                    self.net_rec_rate = 0
-                    self.net_trans_rate = 0
-                else:
-                    self.net_rec_rate = self._net_intf_bytes_rec - self._net_intf_bytes_rec_prev
-                    self.net_trans_rate = self._net_intf_bytes_trans - self._net_intf_bytes_trans_prev
-
-                # setup delta for next iteration
-                self._net_intf_bytes_rec_prev = self._net_intf_bytes_rec
-                self._net_intf_bytes_trans_prev = self._net_intf_bytes_trans
-
-                logger.debug(f'net_rec_rate: {self.net_rec_rate}')
-                logger.debug(f'net_trans_rate: {self.net_trans_rate}')
-
-            # /proc/diskstats file parsing
-            with open(PROC_IO_DEV_PATH, 'r') as io_dev:
-                for line in io_dev.read().splitlines():
-                    if self._io_device in line:
-                        intf_line = line.split()
-                        # offset fields by 2 compared to documentation descriptions
-                        self._io_device_sectors_read = int(intf_line[5])
-                        self._io_device_sectors_written = int(intf_line[9])
-                        break
+            # setup delta for next iteration
+            self._net_intf_bytes_rec_prev = self._net_intf_bytes_rec
+            self._net_intf_bytes_trans_prev = self._net_intf_bytes_trans
+
+            logger.debug('net_rec_rate: %s', self.net_rec_rate)
+            logger.debug('net_trans_rate: %s', self.net_trans_rate)
+
+            # /proc/diskstats file parsing - a single C-level regex scan
+            # replaces the per-line python loop and substring matching
+            io_match = self._io_device_regex.search(disk_stats)
+            if io_match is not None:
+                self._io_device_sectors_read = int(io_match.group(1))
+                self._io_device_sectors_written = int(io_match.group(2))
 
-                logger.debug(f'_io_device_sectors_read: {self._io_device_sectors_read}')
-                logger.debug(f'_io_device_sectors_written: {self._io_device_sectors_written}')
+            logger.debug('_io_device_sectors_read: %s', self._io_device_sectors_read)
+            logger.debug('_io_device_sectors_written: %s', self._io_device_sectors_written)
 
-                logger.debug(f'_io_device_sectors_read_prev: {self._io_device_sectors_read_prev}')
-                logger.debug(f'_io_device_sectors_written_prev: {self._io_device_sectors_written_prev}')
+            logger.debug('_io_device_sectors_read_prev: %s', self._io_device_sectors_read_prev)
+            logger.debug('_io_device_sectors_written_prev: %s', self._io_device_sectors_written_prev)
 
-                # won't do a delta on the first pass, so return 0
-                if self._io_device_sectors_read_prev is None and self._io_device_sectors_written_prev is None:
-                    self.io_bytes_read = 0
-                    self.io_bytes_written = 0
-                else:
-                    self.io_bytes_read = (self._io_device_sectors_read -
-                                          self._io_device_sectors_read_prev) * IO_SECTOR_SIZE
-                    self.io_bytes_written = (self._io_device_sectors_written -
-                                             self._io_device_sectors_written_prev) * IO_SECTOR_SIZE
+            # won't do a delta on the first pass, so return 0
+            if self._io_device_sectors_read_prev is None and self._io_device_sectors_written_prev is None:
+                self.io_bytes_read = 0
+                self.io_bytes_written = 0
+            else:
+                self.io_bytes_read = (self._io_device_sectors_read -
+                                      self._io_device_sectors_read_prev) * IO_SECTOR_SIZE
+                self.io_bytes_written = (self._io_device_sectors_written -
+                                         self._io_device_sectors_written_prev) * IO_SECTOR_SIZE
 
-                # setup delta for next iteration
-                self._io_device_sectors_read_prev = self._io_device_sectors_read
-                self._io_device_sectors_written_prev = self._io_device_sectors_written
+            # setup delta for next iteration
+            self._io_device_sectors_read_prev = self._io_device_sectors_read
+            self._io_device_sectors_written_prev = self._io_device_sectors_written
 
-                logger.debug(f'io_bytes_read: {self.io_bytes_read}')
-                logger.debug(f'io_bytes_written: {self.io_bytes_written}')
+            logger.debug('io_bytes_read: %s', self.io_bytes_read)
+            logger.debug('io_bytes_written: %s', self.io_bytes_written)
 
             # /sys/class/thermal/thermal_zone*/temp parsing
-            if self._cpu_thermal_zone_id is not None:
-                with open(f'/sys/class/thermal/thermal_zone{self._cpu_thermal_zone_id}/temp', 'r') as temp:
-                    self.cpu_package_temp = int(temp.read())
+            if self._cpu_temp_path is not None:
+                self.cpu_package_temp = int(self._read_proc_file(self._cpu_temp_path))
 
-                    logger.debug(f'cpu_package_temp: {self.cpu_package_temp}')
+                logger.debug('cpu_package_temp: %s', self.cpu_package_temp)
             else:
                 logger.debug('Skipping CPU package temperature collection.')
 
             # /sys/class/nvme/nvme*/hwmon0/temp1_input parsing
-            if self._nvme_drive_id is not None and self._nvme_hwmon_id is not None:
+            if self._nvme_temp_path is not None:
                 # temp1_input is traditionally the "composite" temperature
                 # of the NVMe drive, which is used for throttling
-                with open(f'/sys/class/nvme/nvme{self._nvme_drive_id}'
-                          f'/hwmon{self._nvme_hwmon_id}/temp1_input', 'r') as nvme_temp:
-                    self.nvme_composite_temp = int(nvme_temp.read())
+                self.nvme_composite_temp = int(self._read_proc_file(self._nvme_temp_path))
 
-                logger.debug(f'nvme_composite_temp: {self.nvme_composite_temp}')
+                logger.debug('nvme_composite_temp: %s', self.nvme_composite_temp)
             else:
                 logger.debug('Skipping NVMe composite temperature collection.')
 
-            # nvidia-smi command output parsing
-            if self._gpu_type == GPU_TYPES[0]:
-                try:
-                    # use the nvidia-smi utility to parse GPU stats for Nvidia
-                    nvidia_smi_output_raw = subprocess.run(NVIDIA_GPU_STATS_COMMAND, capture_output=True,
-                                                           text=True, check=True)
-                    nvidia_smi_output = nvidia_smi_output_raw.stdout.split(', ')
-                    # returned GPU usage will be a integer percentage
-                    self.gpu_usage = int(nvidia_smi_output[0].split()[0])
-                    # returned GPU memory usage will in MiBs
-                    self.gpu_memory_usage = int(nvidia_smi_output[1].split()[0])
-                    # multiply by 1000 to align with sys sensor readings default format
-                    self.gpu_temp = int(nvidia_smi_output[2]) * 1000
-                except:
-                    self.gpu_usage = 0
-                    self.gpu_memory_usage = 0
-                    self.gpu_temp = 0
-                    logger.warning('Nvidia SMI could not communicate with the Nvidia driver.')
-
-                logger.debug(f'gpu_usage: {self.gpu_usage}')
-                logger.debug(f'gpu_memory_usage: {self.gpu_memory_usage}')
-                logger.debug(f'gpu_temp: {self.gpu_temp}')
-
-            # /sys/class/drm/card*/device/hwmon/hwmon*/temp1_input file parsing
-            elif self._gpu_type == GPU_TYPES[1]:
-                if self._gpu_card_id is not None and self._gpu_hwmon_id is not None:
-                    with open(f'/sys/class/drm/card{self._gpu_card_id}/device'
-                              f'/hwmon/hwmon{self._gpu_hwmon_id}/temp1_input',
-                              'r') as temp:
-                        self.gpu_temp = int(temp.read())
-
-                        logger.debug(f'gpu_temp: {self.gpu_temp}')
-                else:
-                    logger.debug('Skipping GPU temperature collection.')
-
-            # vcgencmd measure_temp command output parsing
-            elif self._gpu_type == GPU_TYPES[2]:
-                try:
-                    # use the vcgencmd utility to parse temperature for Raspberry Pis
-                    vcgencmd_output = subprocess.run(RPI_GPU_TEMP_COMMAND, capture_output=True,
-                                                     text=True, check=True)
-
-                    # multiply by 1000 to align with sys sensor readings default format
-                    self.gpu_temp = int(float(vcgencmd_output.stdout.strip().split('=')[1][:-2]) * 1000)
-
-                except:
-                    self.gpu_temp = 0
-                    logger.warning('Unable to retrieve Raspberry Pi GPU temperature from vcgencmd.')
-
-                logger.debug(f'gpu_temp: {self.gpu_temp}')
-
-            else:
-                logger.debug('No supported GPU type detected. Skipping GPU stats collection.')
+            # GPU stats collection, as bound for the configured gpu_type
+            self._collect_gpu_stats()
 
             logger.info('***** Data collection complete *****')
 
         except Exception as exception:
-            logger.error(f'Encountered following exception: {type(exception)} {exception}')
+            logger.error('Encountered following exception: %s %s', type(exception), exception)
             # uncomment for debugging purposes only
             #logger.error(traceback.format_exc())
+            # drop any cached file descriptors, as one of them may have
+            # gone stale - they will be reopened on the next cycle
+            self.close()
             raise